@@ -3,28 +3,111 @@
             without any dependency on libapt
 """
 
-from __future__ import absolute_import
+# pylint: disable=too-many-lines
 
 # stdlib imports
 import hashlib
 import io
 import logging
 import lzma
+import mmap
 import os
+import re
+import sys
 import tarfile
+import zlib
 
 from collections import defaultdict
-from gzip import GzipFile
-from email import message_from_string, message_from_file
-from functools import cmp_to_key
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from functools import lru_cache
 
 # pypi imports
-import six
 import pgpy
 from arpy import Archive
 
 REQUIRED_HEADERS = ('package', 'version', 'architecture')
 
+
+def _make_deb_order():
+    """Build a 256-entry byte-remap table encoding debian's lexical
+    sort order: tilde sorts before anything (even end-of-part, which
+    is rank 1), then ascii letters, then everything else, each group
+    in plain ascii order."""
+    ranked = sorted(
+        (char for char in range(1, 256) if char != 0x7e),
+        key=lambda char: (
+            0 if 0x41 <= char <= 0x5a or 0x61 <= char <= 0x7a else 1,
+            char))
+    table = bytearray(256)
+    table[0x7e] = 0  # '~'
+    table[0] = 1  # NUL cannot appear; reuse its slot for end-of-part
+    for rank, char in enumerate(ranked, start=2):
+        table[char] = rank
+    return bytes(table)
+
+
+_DEB_ORDER = _make_deb_order()
+
+# alternating runs of non-digits and digits, either possibly empty
+_LISTIFY_RE = re.compile(r'([^0-9]*)(\d*)')
+
+# leading run of non-digits / digits, for get_alphas and get_digits
+_ALPHAS_RE = re.compile(r'[^0-9]*')
+_DIGITS_RE = re.compile(r'\d*')
+
+# "digest size filename" lines in the Files/Checksums-* dsc sections
+_DSC_LINE_RE = re.compile(r'^\s*(\S+)\s+(\d+)\s+(\S+)\s*$', re.M)
+
+# parsed dsc files, keyed by (path, mtime_ns, size) and holding
+# (pgp_message, message) tuples; repeated Dsc objects for the same
+# unchanged file (repository scans, mirror audits) share one parse.
+# entries are treated as read-only once stored.
+_DSC_MESSAGE_CACHE = {}
+_DSC_MESSAGE_CACHE_MAX = 128
+
+# plain dotted-numeric versions (no epoch/revision/letters/tildes),
+# which cover most real-world version strings and can be compared as
+# int tuples without the full policy machinery
+_SIMPLE_VERSION_RE = re.compile(r'\A\d+(?:\.\d+)*\Z')
+
+
+def _parse_control_lines(lines):
+    """Parse RFC822-style control headers into an email.Message,
+    consuming lines from any iterable and stopping at the first blank
+    line.
+
+    dpkg's control subset has no MIME structure to speak of, so a
+    simple line walk is much cheaper than the email feed parser while
+    producing the same Message (continuation lines keep their leading
+    whitespace, exactly as the feed parser leaves them)."""
+    message = Message()
+    pairs = []
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line:
+            break
+        if line[:1] in (' ', '\t') and pairs:
+            # continuation of the previous header
+            pairs[-1][1].append(line)
+            continue
+        key, _, value = line.partition(':')
+        pairs.append([key, [value.strip()]])
+    for key, values in pairs:
+        message[key] = '\n'.join(values)
+    message.set_payload('')
+    return message
+
+
+def _parse_control(text):
+    """Parse an RFC822-style control block held in a string, keeping
+    any body found after the first blank line as the payload."""
+    message = _parse_control_lines(io.StringIO(text))
+    _, sep, body = text.partition('\n\n')
+    if sep:
+        message.set_payload(body)
+    return message
+
 logging.basicConfig()
 
 
@@ -78,7 +161,7 @@ class Dpkg():
         """
         self.filename = os.path.expanduser(filename)
         self.ignore_missing = ignore_missing
-        if not isinstance(self.filename, six.string_types):
+        if not isinstance(self.filename, str):
             raise DpkgError('filename argument must be a string')
         if not os.path.isfile(self.filename):
             raise DpkgError('filename "%s" does not exist' % filename)
@@ -95,7 +178,7 @@ class Dpkg():
         return repr(self.control_str)
 
     def __str__(self):
-        return six.text_type(self.control_str)
+        return str(self.control_str)
 
     def __getattr__(self, attr):
         """Overload getattr to treat control message headers as object
@@ -136,8 +219,21 @@ class Dpkg():
         """
         if self._message is None:
             self._message = self._process_dpkg_file(self.filename)
+            self._promote_headers(self._message)
         return self._message
 
+    def _promote_headers(self, message):
+        """Cache each header in the instance dict under its exact and
+        lowercased names, so repeated attribute reads hit the normal
+        lookup path instead of __getattr__ and a linear scan of the
+        message.  Names that would shadow a real attribute are left to
+        the fallback."""
+        for key, value in message.items():
+            for name in (key, key.lower()):
+                if name not in self.__dict__ \
+                        and not hasattr(type(self), name):
+                    self.__dict__[name] = value
+
     @property
     def control_str(self):
         """Return the control message as a string
@@ -145,7 +241,14 @@ class Dpkg():
         :returns: string
         """
         if self._control_str is None:
-            self._control_str = self.message.as_string()
+            # skip email.Generator: control headers are plain one-line
+            # (or pre-folded multiline) values, so joining them is
+            # equivalent to as_string() and much cheaper
+            message = self.message
+            self._control_str = ''.join(
+                '%s: %s\n' % (key, value)
+                for key, value in message.items()
+            ) + '\n' + message.get_payload()
         return self._control_str
 
     @property
@@ -166,22 +269,53 @@ class Dpkg():
         :returns: dict
         """
         if self._fileinfo is None:
-            h_md5 = hashlib.md5()
-            h_sha1 = hashlib.sha1()
-            h_sha256 = hashlib.sha256()
             with open(self.filename, 'rb') as dpkg_file:
-                for chunk in iter(lambda: dpkg_file.read(128), b''):
-                    h_md5.update(chunk)
-                    h_sha1.update(chunk)
-                    h_sha256.update(chunk)
-            self._fileinfo = {
-                'md5':      h_md5.hexdigest(),
-                'sha1':     h_sha1.hexdigest(),
-                'sha256':   h_sha256.hexdigest(),
-                'filesize': os.path.getsize(self.filename)
-            }
+                filesize = os.fstat(dpkg_file.fileno()).st_size
+                try:
+                    buf = mmap.mmap(
+                        dpkg_file.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # empty and special files cannot be mapped; hash
+                    # them the old-fashioned way
+                    h_md5 = hashlib.md5()
+                    h_sha1 = hashlib.sha1()
+                    h_sha256 = hashlib.sha256()
+                    for chunk in iter(
+                            lambda: dpkg_file.read(1048576), b''):
+                        h_md5.update(chunk)
+                        h_sha1.update(chunk)
+                        h_sha256.update(chunk)
+                    digests = {
+                        'md5': h_md5.hexdigest(),
+                        'sha1': h_sha1.hexdigest(),
+                        'sha256': h_sha256.hexdigest(),
+                    }
+                else:
+                    # hashlib releases the GIL for large buffers, so
+                    # the three digests of the shared map can run on
+                    # separate cores
+                    with ThreadPoolExecutor(max_workers=3) as pool:
+                        futures = {
+                            algo: pool.submit(self._hexdigest, algo, buf)
+                            for algo in ('md5', 'sha1', 'sha256')}
+                        digests = {
+                            algo: future.result()
+                            for algo, future in futures.items()}
+                    buf.close()
+            digests['filesize'] = filesize
+            self._fileinfo = digests
         return self._fileinfo
 
+    @staticmethod
+    def _hexdigest(algo, buf):
+        """Hash an in-memory buffer with a named algorithm in one call
+
+        :param algo: string
+        :param buf: bytes-like object
+        :returns: string
+        """
+        return hashlib.new(algo, buf).hexdigest()
+
     @property
     def md5(self):
         """Return the md5 hash of our target file
@@ -221,7 +355,7 @@ class Dpkg():
         :returns: int
         """
         if self._epoch is None:
-            self._epoch = self.split_full_version(self.version)[0]
+            self._split_version()
         return self._epoch
 
     @property
@@ -231,7 +365,7 @@ class Dpkg():
         :returns: string
         """
         if self._upstream_version is None:
-            self._upstream_version = self.split_full_version(self.version)[1]
+            self._split_version()
         return self._upstream_version
 
     @property
@@ -241,9 +375,21 @@ class Dpkg():
         :returns: string
         """
         if self._debian_revision is None:
-            self._debian_revision = self.split_full_version(self.version)[2]
+            self._split_version()
         return self._debian_revision
 
+    def _split_version(self):
+        """Populate all three version-component caches from a single
+        parse of the version header.  The string components are
+        interned: identical upstream versions and revisions recur
+        constantly when many packages are compared, and interning
+        makes the cached comparator's equality checks pointer
+        comparisons."""
+        epoch, upstream, debian = self.split_full_version(self.version)
+        self._epoch = epoch
+        self._upstream_version = sys.intern(upstream)
+        self._debian_revision = sys.intern(debian)
+
     def get(self, item, default=None):
         """Return an object property, a message header, None or the caller-
         provided default.
@@ -268,121 +414,137 @@ class Dpkg():
         """Compare my version to an arbitrary version"""
         return Dpkg.compare_versions(self.get_header('version'), version_str)
 
-    @staticmethod
-    def _force_encoding(obj, encoding='utf-8'):
-        """Enforce uniform text encoding"""
-        if isinstance(obj, six.string_types):
-            if not isinstance(obj, six.text_type):
-                obj = six.text_type(obj, encoding)
-        return obj
-
     def _extract_message(self, ctar):
         # pathname in the tar could be ./control, or just control
         # (there would never be two control files...right?)
-        tar_members = [
-            os.path.basename(x.name) for x in ctar.getmembers()]
-        self._log.debug('got tar members: %s', tar_members)
-        if 'control' not in tar_members:
-            raise DpkgMissingControlFile(
-                'Corrupt dpkg file: no control file in control.tar.gz')
-        control_idx = tar_members.index('control')
-        self._log.debug('got control index: %s', control_idx)
-        # at last!
-        control_file = ctar.extractfile(
-            ctar.getmembers()[control_idx])
-        self._log.debug('got control file: %s', control_file)
-        message_body = control_file.read()
-        # py27 lacks email.message_from_bytes, so...
-        if isinstance(message_body, bytes):
-            message_body = message_body.decode('utf-8')
-        message = message_from_string(message_body)
-        self._log.debug('got control message: %s', message)
-        return message
+        for member in ctar:
+            if os.path.basename(member.name) != 'control':
+                continue
+            self._log.debug('got control member: %s', member.name)
+            # at last!
+            control_file = ctar.extractfile(member)
+            self._log.debug('got control file: %s', control_file)
+            # decode incrementally and stop at the first blank line
+            # rather than slurping and decoding the whole member
+            # (no TextIOWrapper: tarfile stream objects lack seekable)
+            message = _parse_control_lines(
+                line.decode('utf-8') for line in control_file)
+            self._log.debug('got control message: %s', message)
+            return message
+        raise DpkgMissingControlFile(
+            'Corrupt dpkg file: no control file in control.tar.gz')
+
+    def _decompress_control(self, control_archive, archive_type):
+        """Decompress a control tarball according to its compression
+        suffix ('gz', 'xz' or 'zst') and extract the control message
+        from it."""
+        if archive_type == 'gz':
+            # control.tar.gz is a few KiB at most: one C-level zlib
+            # call beats GzipFile's python-side streaming machinery
+            # (wbits=31 means gzip wrapper, max window)
+            tar_bytes = zlib.decompress(control_archive.read(), wbits=31)
+            self._log.debug('decompressed gzip control archive')
+            with tarfile.open(fileobj=io.BytesIO(tar_bytes)) as ctar:
+                self._log.debug('opened tar file: %s', ctar)
+                return self._extract_message(ctar)
+        if archive_type == 'zst':
+            try:
+                import zstandard  # pylint: disable=import-outside-toplevel
+            except ImportError:
+                raise DpkgError(
+                    'found control.tar.zst but the "zstandard" module '
+                    'is not installed')
+            dctx = zstandard.ZstdDecompressor()
+            with dctx.stream_reader(control_archive) as zstf:
+                self._log.debug('opened zstd control archive: %s', zstf)
+                with tarfile.open(fileobj=zstf, mode='r|') as ctar:
+                    self._log.debug('opened tar file: %s', ctar)
+                    return self._extract_message(ctar)
+        # stream the tar straight out of the decompressor rather
+        # than buffering the whole decompressed archive
+        with lzma.open(control_archive) as xzf:
+            self._log.debug('opened xz control archive: %s', xzf)
+            with tarfile.open(fileobj=xzf, mode='r|') as ctar:
+                self._log.debug('opened tar file: %s', ctar)
+                return self._extract_message(ctar)
 
     def _process_dpkg_file(self, filename):
         dpkg_archive = Archive(filename)
-        dpkg_archive.read_all_headers()
-        if b'control.tar.gz' in dpkg_archive.archived_files:
-            control_archive = dpkg_archive.archived_files[b'control.tar.gz']
-            control_archive_type = "gz"
-        elif b'control.tar.xz' in dpkg_archive.archived_files:
-            control_archive = dpkg_archive.archived_files[b'control.tar.xz']
-            control_archive_type = "xz"
-        else:
+        # walk the ar headers in order and stop at the control member;
+        # it precedes the (potentially huge) data.tar member, whose
+        # header we then never even look at
+        control_archive = None
+        while True:
+            header = dpkg_archive.read_next_header()
+            if header is None:
+                break
+            suffix = header.name.rsplit(b'.', 1)[-1]
+            if header.name.startswith(b'control.tar.') and \
+                    suffix in (b'gz', b'xz', b'zst'):
+                control_archive = dpkg_archive.archived_files[header.name]
+                control_archive_type = suffix.decode()
+                break
+        if control_archive is None:
             raise DpkgMissingControlGzipFile(
-                'Corrupt dpkg file: no control.tar.gz/xz file in ar archive.')
-        self._log.debug('found controlgz: %s', control_archive)
-
-        if control_archive_type == "gz":
-            with GzipFile(fileobj=control_archive) as gzf:
-                self._log.debug('opened gzip control archive: %s', gzf)
-                with tarfile.open(fileobj=io.BytesIO(gzf.read())) as ctar:
-                    self._log.debug('opened tar file: %s', ctar)
-                    message = self._extract_message(ctar)
-        else:
-            with lzma.open(control_archive) as xzf:
-                self._log.debug('opened xz control archive: %s', xzf)
-                with tarfile.open(fileobj=io.BytesIO(xzf.read())) as ctar:
-                    self._log.debug('opened tar file: %s', ctar)
-                    message = self._extract_message(ctar)
-
-        for req in REQUIRED_HEADERS:
-            if req not in list(map(str.lower, message.keys())):
-                if self.ignore_missing:
-                    self._log.debug(
-                        'Header "%s" not found in control message', req)
-                    continue
+                'Corrupt dpkg file: no control.tar.{gz,xz,zst} file '
+                'in ar archive.')
+        self._log.debug('found control archive: %s', control_archive)
+        message = self._decompress_control(
+            control_archive, control_archive_type)
+
+        have = {key.lower() for key in message.keys()}
+        missing = [req for req in REQUIRED_HEADERS if req not in have]
+        if missing:
+            if not self.ignore_missing:
                 raise DpkgMissingRequiredHeaderError(
-                    'Corrupt control section; header: "%s" not found' % req)
+                    'Corrupt control section; headers not found: %s' %
+                    ', '.join('"%s"' % req for req in missing))
+            self._log.debug(
+                'Headers not found in control message: %s', missing)
         self._log.debug('all required headers found')
 
-        for header in message.keys():
-            self._log.debug('coercing header to utf8: %s', header)
-            message.replace_header(
-                header, self._force_encoding(message[header]))
-        self._log.debug('all required headers coerced')
-
         return message
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def get_epoch(version_str):
         """ Parse the epoch out of a package version string.
         Return (epoch, version); epoch is zero if not found."""
-        try:
-            # there could be more than one colon,
-            # but we only care about the first
-            e_index = version_str.index(':')
-        except ValueError:
+        # there could be more than one colon,
+        # but we only care about the first
+        head, sep, tail = version_str.partition(':')
+        if not sep:
             # no colons means no epoch; that's valid, man
             return 0, version_str
 
         try:
-            epoch = int(version_str[0:e_index])
+            epoch = int(head)
         except ValueError:
             raise DpkgVersionError(
                 'Corrupt dpkg version %s: epochs can only be ints, and '
                 'epochless versions cannot use the colon character.' %
                 version_str)
 
-        return epoch, version_str[e_index + 1:]
+        return epoch, tail
 
     @staticmethod
     def get_upstream(version_str):
         """Given a version string that could potentially contain both an upstream
         revision and a debian revision, return a tuple of both.  If there is no
         debian revision, return 0 as the second tuple element."""
-        try:
-            d_index = version_str.rindex('-')
-        except ValueError:
+        head, sep, tail = version_str.rpartition('-')
+        if not sep:
             # no hyphens means no debian version, also valid.
             return version_str, '0'
 
-        return version_str[0:d_index], version_str[d_index+1:]
+        return head, tail
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def split_full_version(version_str):
         """Split a full version string into epoch, upstream version and
-        debian revision.
+        debian revision.  Results are memoized: sorting parses each
+        version string O(n log n) times otherwise.
         :param: version_str
         :returns: tuple """
         epoch, full_ver = Dpkg.get_epoch(version_str)
@@ -394,29 +556,33 @@ class Dpkg():
         """Return a tuple of the first non-digit characters of a revision (which
         may be empty) and the remaining characters."""
         # get the index of the first digit
-        for i, char in enumerate(revision_str):
-            if char.isdigit():
-                if i == 0:
-                    return '', revision_str
-                return revision_str[0:i], revision_str[i:]
-        # string is entirely alphas
-        return revision_str, ''
+        i = _ALPHAS_RE.match(revision_str).end()
+        return revision_str[0:i], revision_str[i:]
 
     @staticmethod
     def get_digits(revision_str):
         """Return a tuple of the first integer characters of a revision (which
         may be empty) and the remains."""
-        # If the string is empty, return (0,'')
-        if not revision_str:
-            return 0, ''
         # get the index of the first non-digit
-        for i, char in enumerate(revision_str):
-            if not char.isdigit():
-                if i == 0:
-                    return 0, revision_str
-                return int(revision_str[0:i]), revision_str[i:]
-        # string is entirely digits
-        return int(revision_str), ''
+        i = _DIGITS_RE.match(revision_str).end()
+        if i == 0:
+            return 0, revision_str
+        return int(revision_str[0:i]), revision_str[i:]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _listify_tuple(revision_str):
+        """Memoized worker for listify(), returning a tuple: caching a
+        mutable list would hand every caller the same object, where one
+        stray mutation corrupts all later comparisons."""
+        result = []
+        for alphas, digits in _LISTIFY_RE.findall(revision_str):
+            if not alphas and not digits:
+                # the terminating empty match
+                break
+            result.append(alphas)
+            result.append(int(digits) if digits else 0)
+        return tuple(result)
 
     @staticmethod
     def listify(revision_str):
@@ -425,16 +591,12 @@ class Dpkg():
         always be of even length.  This allows us to trivially implement the
         comparison algorithm described at
         http://debian.org/doc/debian-policy/ch-controlfields.html#s-f-Version
+
+        Returns a fresh list; the parsed form is cached internally.
         """
-        result = []
-        while revision_str:
-            rev_1, remains = Dpkg.get_alphas(revision_str)
-            rev_2, remains = Dpkg.get_digits(remains)
-            result.extend([rev_1, rev_2])
-            revision_str = remains
-        return result
-
-    # pylint: disable=invalid-name,too-many-return-statements
+        return list(Dpkg._listify_tuple(revision_str))
+
+    # pylint: disable=invalid-name
     @staticmethod
     def dstringcmp(a, b):
         """debian package version string section lexical sort algorithm
@@ -443,40 +605,9 @@ class Dpkg():
         that all the letters sort earlier than all the non-letters and so that
         a tilde sorts before anything, even the end of a part."
         """
-
-        if a == b:
-            return 0
-        try:
-            for i, char in enumerate(a):
-                if char == b[i]:
-                    continue
-                # "a tilde sorts before anything, even the end of a part"
-                # (emptyness)
-                if char == '~':
-                    return -1
-                if b[i] == '~':
-                    return 1
-                # "all the letters sort earlier than all the non-letters"
-                if char.isalpha() and not b[i].isalpha():
-                    return -1
-                if not char.isalpha() and b[i].isalpha():
-                    return 1
-                # otherwise lexical sort
-                if ord(char) > ord(b[i]):
-                    return 1
-                if ord(char) < ord(b[i]):
-                    return -1
-        except IndexError:
-            # a is longer than b but otherwise equal, hence greater
-            # ...except for goddamn tildes
-            if char == '~':
-                return -1
-            return 1
-        # if we get here, a is shorter than b but otherwise equal, hence lesser
-        # ...except for goddamn tildes
-        if b[len(a)] == '~':
-            return 1
-        return -1
+        key_a = Dpkg.dstringcmp_key(a)
+        key_b = Dpkg.dstringcmp_key(b)
+        return (key_a > key_b) - (key_a < key_b)
 
     @staticmethod
     def compare_revision_strings(rev1, rev2):
@@ -487,8 +618,8 @@ class Dpkg():
             return 0
         # listify pads results so that we will always be comparing ints to ints
         # and strings to strings (at least until we fall off the end of a list)
-        list1 = Dpkg.listify(rev1)
-        list2 = Dpkg.listify(rev2)
+        list1 = Dpkg._listify_tuple(rev1)
+        list2 = Dpkg._listify_tuple(rev2)
         if list1 == list2:
             return 0
         try:
@@ -501,15 +632,11 @@ class Dpkg():
                 # if the items are equal, next
                 if item == list2[i]:
                     continue
-                # numeric comparison
+                # numeric comparison (branchless sign)
                 if isinstance(item, int):
-                    if item > list2[i]:
-                        return 1
-                    if item < list2[i]:
-                        return -1
-                else:
-                    # string comparison
-                    return Dpkg.dstringcmp(item, list2[i])
+                    return (item > list2[i]) - (item < list2[i])
+                # string comparison
+                return Dpkg.dstringcmp(item, list2[i])
         except IndexError:
             # rev1 is longer than rev2 but otherwise equal, hence greater
             return 1
@@ -517,51 +644,92 @@ class Dpkg():
         return -1
 
     @staticmethod
+    @lru_cache(maxsize=8192)
     def compare_versions(ver1, ver2):
         """Function to compare two Debian package version strings,
-        suitable for passing to list.sort() and friends."""
+        suitable for passing to list.sort() and friends.  Results are
+        memoized; resolvers tend to compare the same pairs over and
+        over."""
         if ver1 == ver2:
             return 0
 
-        # note the string conversion: the debian policy here explicitly
-        # specifies ASCII string comparisons, so if you are mad enough to
-        # actually cram unicode characters into your package name, you are on
+        # fast path: two dotted-numeric versions compare as int
+        # tuples, which agrees with the policy algorithm (numeric
+        # runs compare by value, a longer otherwise-equal version is
+        # greater, and neither side has an epoch or revision)
+        if isinstance(ver1, str) and isinstance(ver2, str) and \
+                _SIMPLE_VERSION_RE.match(ver1) and \
+                _SIMPLE_VERSION_RE.match(ver2):
+            tup1 = tuple(map(int, ver1.split('.')))
+            tup2 = tuple(map(int, ver2.split('.')))
+            return (tup1 > tup2) - (tup1 < tup2)
+
+        # the cached sort keys encode the whole policy ordering
+        # (epoch, then upstream, then debian revision) as tuples that
+        # compare natively, so repeated comparisons of the same
+        # versions cost two cache lookups and one C-level compare.
+        # note the string conversion inside the key encoder: the
+        # debian policy here explicitly specifies ASCII string
+        # comparisons, so if you are mad enough to actually cram
+        # unicode characters into your package name, you are on
         # your own.
-        epoch1, upstream1, debian1 = Dpkg.split_full_version(str(ver1))
-        epoch2, upstream2, debian2 = Dpkg.split_full_version(str(ver2))
-
-        # if epochs differ, immediately return the newer one
-        if epoch1 < epoch2:
-            return -1
-        if epoch1 > epoch2:
-            return 1
+        key1 = Dpkg.compare_versions_key(ver1)
+        key2 = Dpkg.compare_versions_key(ver2)
+        return (key1 > key2) - (key1 < key2)
 
-        # then, compare the upstream versions
-        upstr_res = Dpkg.compare_revision_strings(upstream1, upstream2)
-        if upstr_res != 0:
-            return upstr_res
-
-        debian_res = Dpkg.compare_revision_strings(debian1, debian2)
-        if debian_res != 0:
-            return debian_res
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def compare_versions_key(x):
+        """Encode a version string as a tuple that sorts natively in
+        the order compare_versions() defines, suitable for passing to
+        sorted() and friends as a key.  Each version is parsed exactly
+        once; the actual comparisons are then plain C-level tuple
+        comparisons instead of cmp_to_key round-trips through
+        compare_versions()."""
+        epoch, upstream, debian = Dpkg.split_full_version(str(x))
+        return (epoch,
+                Dpkg._tokenize_revision(upstream),
+                Dpkg._tokenize_revision(debian))
 
-        # at this point, the versions are equal, but due to an interpolated
-        # zero in either the epoch or the debian version
-        return 0
+    @staticmethod
+    def sort_versions(versions):
+        """Sort an iterable of version strings into ascending debian
+        policy order and return them as a list.  Each version is
+        encoded once via compare_versions_key, so the sort itself runs
+        entirely in C with no python callbacks per comparison.
+
+        :param versions: iterable of strings
+        :returns: list
+        """
+        return sorted(versions, key=Dpkg.compare_versions_key)
 
     @staticmethod
-    def compare_versions_key(x):
-        """Uses functools.cmp_to_key to convert the compare_versions()
-        function to a function suitable to passing to sorted() and friends
-        as a key."""
-        return cmp_to_key(Dpkg.compare_versions)(x)
+    def _tokenize_revision(revision_str):
+        """Encode a revision string as a tuple of alternating
+        dstringcmp-translated bytes and ints, so that native tuple
+        comparison reproduces compare_revision_strings()."""
+        return tuple(
+            Dpkg.dstringcmp_key(part) if isinstance(part, str) else part
+            for part in Dpkg._listify_tuple(revision_str))
 
     @staticmethod
     def dstringcmp_key(x):
-        """Uses functools.cmp_to_key to convert the dstringcmp()
-        function to a function suitable to passing to sorted() and friends
-        as a key."""
-        return cmp_to_key(Dpkg.dstringcmp)(x)
+        """Translate a version part into a bytes object that sorts in
+        the debian order under plain comparison, suitable for passing
+        to sorted() and friends as a key.  The appended rank-1 byte
+        stands in for the end of the part, so that a trailing tilde
+        sorts before it.
+
+        latin-1 maps each codepoint below 256 to the byte of the same
+        value, which is exactly the ordinal ordering the rank table
+        encodes; anything beyond that has no defined debian ordering.
+        """
+        try:
+            encoded = x.encode('latin-1')
+        except UnicodeEncodeError:
+            raise DpkgVersionError(
+                'Cannot compare non-latin-1 version part: %r' % x)
+        return encoded.translate(_DEB_ORDER) + b'\x01'
 
 
 class Dsc():
@@ -570,8 +738,13 @@ class Dsc():
     def __init__(self, filename=None, logger=None):
         self.filename = os.path.expanduser(filename)
         self._dirname = os.path.dirname(self.filename)
+        # resolved once so the per-file loops can skip abspath's
+        # getcwd call
+        self._absdir = os.path.abspath(self._dirname)
         self._log = logger or logging.getLogger(__name__)
         self._message = None
+        self._attr_map = None
+        self._headers = None
         self._source_files = None
         self._sizes = None
         self._message_str = None
@@ -583,7 +756,7 @@ class Dsc():
         return repr(self.message_str)
 
     def __str__(self):
-        return six.text_type(self.message_str)
+        return str(self.message_str)
 
     def __getattr__(self, attr):
         """Overload getattr to treat message headers as object
@@ -597,11 +770,13 @@ class Dsc():
         self._log.debug('grabbing attr: %s', attr)
         if attr in self.__dict__:
             return self.__dict__[attr]
-        # handle attributes with dashes :-(
-        munged = attr.replace('_', '-')
-        # beware: email.Message[nonexistent] returns None not KeyError
-        if munged in self.message:
-            return self.message[munged]
+        if self.__dict__.get('_attr_map') is None:
+            # parsing the message also builds the attribute map
+            self.message  # pylint: disable=pointless-statement
+        # the map handles both dashes-for-underscores and case munging
+        key = self._attr_map.get(attr.lower().replace('-', '_'))
+        if key is not None:
+            return self._message[key]
         raise AttributeError("'Dsc' object has no attribute '%s'" % attr)
 
     def __getitem__(self, item):
@@ -634,21 +809,25 @@ class Dsc():
         self._log.debug('accessing message property')
         if self._message is None:
             self._message = self._process_dsc_file()
+            # precompute the munged-name lookup used by __getattr__ so
+            # attribute access is a dict hit instead of a header scan
+            self._attr_map = {
+                key.lower().replace('-', '_'): key
+                for key in self._message.keys()}
         return self._message
 
     @property
     def headers(self):
         """Return a dictionary of the message items"""
-        if self._message is None:
-            self._message = self._process_dsc_file()
-        return dict(self._message.items())
+        if self._headers is None:
+            self._headers = dict(self.message.items())
+        return self._headers
 
     @property
     def pgp_message(self):
         """Return a pgpy.PGPMessage object containing the signed dsc
         message (or None if the message is unsigned)"""
-        if self._message is None:
-            self._message = self._process_dsc_file()
+        self.message  # pylint: disable=pointless-statement
         return self._pgp_message
 
     @property
@@ -673,7 +852,11 @@ class Dsc():
     @property
     def corrected_checksums(self):
         """Returns a dict of the CORRECT checksums in any case
-        where the ones provided by the dsc file are incorrect."""
+        where the ones provided by the dsc file are incorrect.
+
+        If a file's size does not match the size the dsc asserts for
+        it, the file cannot possibly hash correctly and is not read;
+        its entry is reported with a digest of None."""
         if self._corrected_checksums is None:
             self._corrected_checksums = self._validate_checksums()
         return self._corrected_checksums
@@ -734,12 +917,10 @@ class Dsc():
                 continue
             sums[hashtype] = {}
             source = self.message[key]
-            for line in source.split('\n'):
-                if line:  # grrr py3--
-                    digest, _, filename = line.strip().split(' ')
-                    pathname = os.path.abspath(
-                        os.path.join(self._dirname, filename))
-                    sums[hashtype][pathname] = digest
+            for digest, _, filename in _DSC_LINE_RE.findall(source):
+                pathname = os.path.normpath(
+                    os.path.join(self._absdir, filename))
+                sums[hashtype][pathname] = digest
         return sums
 
     def _internalize_message(self, msg):
@@ -749,6 +930,7 @@ class Dsc():
         self._log.debug('internalize_message()')
         base = os.path.basename(self.filename)
         size = os.path.getsize(self.filename)
+        missing = {}
         for key, source in msg.items():
             self._log.debug('processing key: %s', key)
             if key.lower().startswith('checksums'):
@@ -757,27 +939,33 @@ class Dsc():
                 hashtype = 'md5'
             else:
                 continue
-            found = []
-            for line in source.split('\n'):
-                if line:  # grrr
-                    found.append(line.strip().split(' '))
-            files = [x[2] for x in found]
+            files = [x[2] for x in _DSC_LINE_RE.findall(source)]
             if base not in files:
                 self._log.debug('dsc file not found in %s: %s', key, base)
-                self._log.debug('getting hasher for %s', hashtype)
-                hasher = getattr(hashlib, hashtype)()
-                self._log.debug('hashing file')
-                with open(self.filename, 'rb') as fileobj:
-                    # pylint: disable=cell-var-from-loop
-                    for chunk in iter(lambda: fileobj.read(1024), b''):
-                        hasher.update(chunk)
-                    self._log.debug('completed hashing file')
-                self._log.debug('got %s digest: %s',
-                                hashtype, hasher.hexdigest())
-                newline = '\n {0} {1} {2}'.format(
-                    hasher.hexdigest(), size, base)
-                self._log.debug('new line: %s', newline)
-                msg.replace_header(key, msg[key] + newline)
+                missing[key] = hashtype
+        if not missing:
+            return msg
+
+        # read the (small) dsc once and feed every needed hasher from
+        # the same buffer, rather than re-reading it per section
+        with open(self.filename, 'rb') as fileobj:
+            try:
+                buf = mmap.mmap(
+                    fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                buf = fileobj.read()
+            digests = {
+                hashtype: hashlib.new(hashtype, buf).hexdigest()
+                for hashtype in set(missing.values())}
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+        self._log.debug('got digests: %s', digests)
+
+        for key, hashtype in missing.items():
+            newline = '\n {0} {1} {2}'.format(
+                digests[hashtype], size, base)
+            self._log.debug('new line: %s', newline)
+            msg.replace_header(key, msg[key] + newline)
         return msg
 
     def _process_dsc_file(self):
@@ -785,6 +973,16 @@ class Dsc():
         and return an email.Message object.  Attempt to extract the
         RFC822 message from an OpenPGP message if necessary."""
         self._log.debug('process_dsc_file()')
+        try:
+            stat = os.stat(self.filename)
+            cache_key = (os.path.abspath(self.filename),
+                         stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            cache_key = None
+        if cache_key is not None and cache_key in _DSC_MESSAGE_CACHE:
+            self._log.debug('dsc message cache hit: %s', self.filename)
+            self._pgp_message, msg = _DSC_MESSAGE_CACHE[cache_key]
+            return msg
         if not self.filename.endswith('.dsc'):
             self._log.debug(
                 'File %s does not appear to be a dsc file; pressing '
@@ -793,7 +991,7 @@ class Dsc():
         try:
             self._pgp_message = pgpy.PGPMessage.from_file(self.filename)
             self._log.debug('Found pgp signed message')
-            msg = message_from_string(self._pgp_message.message)
+            msg = _parse_control(str(self._pgp_message.message))
         except TypeError as ex:
             self._log.exception(ex)
             self._log.fatal(
@@ -807,8 +1005,12 @@ class Dsc():
             self._log.warning('dsc file %s is not signed: %s',
                               self.filename, ex)
             with open(self.filename) as fileobj:
-                msg = message_from_file(fileobj)
+                msg = _parse_control(fileobj.read())
         msg = self._internalize_message(msg)
+        if cache_key is not None:
+            if len(_DSC_MESSAGE_CACHE) >= _DSC_MESSAGE_CACHE_MAX:
+                _DSC_MESSAGE_CACHE.clear()
+            _DSC_MESSAGE_CACHE[cache_key] = (self._pgp_message, msg)
         return msg
 
     def _process_source_files(self):
@@ -824,19 +1026,17 @@ class Dsc():
         """
         self._log.debug('process_source_files()')
         filenames = []
-        try:
-            files = self.message['Files']
-        except KeyError:
+        # beware: email.Message[nonexistent] returns None not KeyError
+        files = self.message['Files']
+        if files is None:
             self._log.fatal('DSC file "%s" does not have a Files section',
                             self.filename)
-            raise
-        for line in files.split('\n'):
-            if line:
-                _, size, filename = line.strip().split(' ')
-                pathname = os.path.abspath(
-                    os.path.join(self._dirname, filename))
-                filenames.append(
-                    (pathname, int(size), os.path.isfile(pathname)))
+            raise KeyError('Files')
+        for _, size, filename in _DSC_LINE_RE.findall(files):
+            pathname = os.path.normpath(
+                os.path.join(self._absdir, filename))
+            filenames.append(
+                (pathname, int(size), os.path.isfile(pathname)))
         return filenames
 
     def _validate_checksums(self):
@@ -846,13 +1046,70 @@ class Dsc():
         and return them all at the end."""
         self._log.debug('validate_checksums()')
         bad_hashes = defaultdict(lambda: defaultdict(None))
-        for hashtype, filenames in six.iteritems(self.checksums):
-            for filename, digest in six.iteritems(filenames):
-                hasher = getattr(hashlib, hashtype)()
-                with open(filename, 'rb') as fileobj:
-                    # pylint: disable=cell-var-from-loop
-                    for chunk in iter(lambda: fileobj.read(128), b''):
-                        hasher.update(chunk)
-                if hasher.hexdigest() != digest:
-                    bad_hashes[hashtype][filename] = hasher.hexdigest()
+        checksums = self.checksums
+        # group by filename so each file is read once no matter how
+        # many hash types the dsc asserts for it
+        files_to_hashtypes = defaultdict(set)
+        for hashtype, filenames in checksums.items():
+            for filename in filenames:
+                files_to_hashtypes[filename].add(hashtype)
+        if not files_to_hashtypes:
+            return dict(bad_hashes)
+        # cheap reject: a file whose size differs from the dsc's own
+        # assertion cannot possibly hash correctly, so do not bother
+        # reading it (its entry is reported with a None digest).  the
+        # sizes come from the Files section, which a dsc that only
+        # carries Checksums-* headers may not have.
+        expected_sizes = {}
+        if self.message['Files'] is not None:
+            if self._source_files is None:
+                self._source_files = self._process_source_files()
+            expected_sizes = {x[0]: x[1] for x in self._source_files}
+        tasks = []
+        for filename, hashtypes in sorted(files_to_hashtypes.items()):
+            expected = expected_sizes.get(filename)
+            if expected is not None and os.path.isfile(filename) \
+                    and os.path.getsize(filename) != expected:
+                self._log.debug(
+                    'size mismatch for %s, skipping hash', filename)
+                for hashtype in hashtypes:
+                    bad_hashes[hashtype][filename] = None
+                continue
+            tasks.append((filename, hashtypes))
+        if not tasks:
+            return dict(bad_hashes)
+        # the files are independent and hashing releases the GIL, so
+        # spread them across a few workers
+        with ThreadPoolExecutor(
+                max_workers=min(8, len(tasks))) as pool:
+            results = list(pool.map(self._hash_file, tasks))
+        for (filename, _), digests in zip(tasks, results):
+            for hashtype, actual in digests.items():
+                if actual != checksums[hashtype][filename]:
+                    bad_hashes[hashtype][filename] = actual
         return dict(bad_hashes)
+
+    @staticmethod
+    def _hash_file(task):
+        """Hash one (filename, hashtypes) task in a single pass over
+        the file, returning {hashtype: hexdigest}."""
+        filename, hashtypes = task
+        hashers = {
+            hashtype: hashlib.new(hashtype) for hashtype in hashtypes}
+        with open(filename, 'rb') as fileobj:
+            try:
+                buf = mmap.mmap(
+                    fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty/special files: chunked fallback
+                for chunk in iter(
+                        lambda: fileobj.read(1048576), b''):
+                    for hasher in hashers.values():
+                        hasher.update(chunk)
+            else:
+                for hasher in hashers.values():
+                    hasher.update(buf)
+                buf.close()
+        return {
+            hashtype: hasher.hexdigest()
+            for hashtype, hasher in hashers.items()}
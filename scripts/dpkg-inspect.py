@@ -1,12 +1,12 @@
 #!/usr/bin/env python
 
-from __future__ import print_function
-
 import glob
 import logging
 import os
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
+
 from pydpkg import Dpkg
 
 logging.basicConfig()
@@ -21,25 +21,50 @@ SHA256:   {4}
 Headers:
 {5}"""
 
+# files already inspected during this run, keyed by (path, mtime, size)
+# so the same package listed twice (or matched by overlapping globs) is
+# only parsed and hashed once
+cache = {}
+
 
 def indent(input_str, prefix):
     return '\n'.join(
         ['%s%s' % (prefix, x) for x in input_str.split('\n')]
     )
 
+
+def inspect(fn):
+    st = os.stat(fn)
+    key = (os.path.realpath(fn), st.st_mtime_ns, st.st_size)
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    log.debug('checking %s', fn)
+    dp = Dpkg(fn)
+    output = PRETTY.format(
+        fn, dp.filesize, dp.md5, dp.sha1, dp.sha256,
+        indent(str(dp), '  ')
+    )
+    cache[key] = output
+    return output
+
 try:
     filenames = sys.argv[1:]
 except KeyError:
     log.fatal('You must list at least one deb file as an argument')
     sys.exit(1)
 
+targets = []
 for files in filenames:
     for fn in glob.glob(files):
         if not os.path.isfile(fn):
             log.warning('%s is not a file, skipping', fn)
-        log.debug('checking %s', fn)
-        dp = Dpkg(fn)
-        print(PRETTY.format(
-            fn, dp.filesize, dp.md5, dp.sha1, dp.sha256,
-            indent(str(dp), '  ')
-        ))
+            continue
+        targets.append(fn)
+
+# hashing releases the GIL, so inspecting packages in parallel scales
+# across cores; map() keeps the output in submission order
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+    for output in pool.map(inspect, targets):
+        print(output)
@@ -21,11 +21,11 @@ setup(
     ],
     install_requires=[
         'arpy==1.1.1',
-        'six==1.10.0',
         'PGPy==0.4.1'
     ],
     extras_require={
-        'test': ['pep8==1.7.0', 'pytest==3.1.1', 'pylint==2.3.1'],
+        'test': ['pep8==1.7.0', 'pytest==3.1.1', 'pylint==2.3.1',
+                 'zstandard'],
         'publish': ['twine']
     },
     scripts=[
@@ -9,12 +9,14 @@ from pydpkg import Dpkg, DpkgVersionError
 
 TEST_DPKG_GZ_FILE = 'testdeb_1:0.0.0-test_all.deb'
 TEST_DPKG_XZ_FILE = 'sample_package_xz.deb'
+TEST_DPKG_ZST_FILE = 'sample_package_zst.deb'
 
 
 class DpkgGzTest(unittest.TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         dpkgfile = os.path.join(os.path.dirname(__file__), TEST_DPKG_GZ_FILE)
-        self.dpkg = Dpkg(dpkgfile)
+        cls.dpkg = Dpkg(dpkgfile)
 
     def test_get_versions(self):
         self.assertEqual(self.dpkg.epoch, 1)
@@ -40,9 +42,39 @@ class DpkgGzTest(unittest.TestCase):
 
 
 class DpkgXzTest(unittest.TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         dpkgfile = os.path.join(os.path.dirname(__file__), TEST_DPKG_XZ_FILE)
-        self.dpkg = Dpkg(dpkgfile)
+        cls.dpkg = Dpkg(dpkgfile)
+
+    def test_get_versions(self):
+        self.assertEqual(self.dpkg.epoch, 0)
+        self.assertEqual(self.dpkg.upstream_version, '0.0.1')
+        self.assertEqual(self.dpkg.debian_revision, '0')
+
+    def test_get_message_headers(self):
+        self.assertEqual(self.dpkg.package, 'samplepackage.test')
+        self.assertEqual(self.dpkg.PACKAGE, 'samplepackage.test')
+        self.assertEqual(self.dpkg['package'], 'samplepackage.test')
+        self.assertEqual(self.dpkg['PACKAGE'], 'samplepackage.test')
+        self.assertEqual(self.dpkg.get('package'), 'samplepackage.test')
+        self.assertEqual(self.dpkg.get('PACKAGE'), 'samplepackage.test')
+        self.assertEqual(self.dpkg.get('nonexistent'), None)
+        self.assertEqual(self.dpkg.get('nonexistent', 'foo'), 'foo')
+
+    def test_missing_header(self):
+        self.assertRaises(KeyError, self.dpkg.__getitem__, 'xyzzy')
+        self.assertRaises(AttributeError, self.dpkg.__getattr__, 'xyzzy')
+
+    def test_message(self):
+        self.assertIsInstance(self.dpkg.message, type(Message()))
+
+
+class DpkgZstTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        dpkgfile = os.path.join(os.path.dirname(__file__), TEST_DPKG_ZST_FILE)
+        cls.dpkg = Dpkg(dpkgfile)
 
     def test_get_versions(self):
         self.assertEqual(self.dpkg.epoch, 0)
@@ -201,6 +233,12 @@ class DpkgVersionsTest(unittest.TestCase):
         self.assertEqual(Dpkg.compare_versions(u'2:0.0.44-nobin', u'2:0.0.44-1'), 1)
         self.assertEqual(Dpkg.compare_versions(u'2:0.0.44-1', u'2:0.0.44-1'), 0)
 
+    def test_sort_versions(self):
+        self.assertEqual(
+            Dpkg.sort_versions(
+                ['0.0.10', '1:0.0.1', '0.0.9-2', '0.0.9-1', '0.0.9']),
+            ['0.0.9', '0.0.9-1', '0.0.9-2', '0.0.10', '1:0.0.1'])
+
 
 if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromTestCase(DpkgGzTest)
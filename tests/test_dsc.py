@@ -18,22 +18,26 @@ TEST_SIGNED_DSC_FILE = 'testdeb_0.0.0.dsc.asc'
 TEST_BAD_DSC_FILE = 'testdeb_1.1.1-bad.dsc'
 TEST_BAD_SIGNED_FILE = 'testdeb_1.1.1-bad.dsc.asc'
 TEST_BAD_CHECKSUMS_FILE = 'testdeb_0.0.0-badchecksums.dsc'
+TEST_BAD_SIZES_FILE = 'testdeb_0.0.0-badsizes.dsc'
 
 
 class DscTest(unittest.TestCase):
 
-    def setUp(self):
-        self.dirn = os.path.dirname(__file__)
-        goodfile = os.path.join(self.dirn, TEST_DSC_FILE)
-        signed = os.path.join(self.dirn, TEST_SIGNED_DSC_FILE)
-        badfile = os.path.join(self.dirn, TEST_BAD_DSC_FILE)
-        badsigned = os.path.join(self.dirn, TEST_BAD_SIGNED_FILE)
-        badchecksums = os.path.join(self.dirn, TEST_BAD_CHECKSUMS_FILE)
-        self.good = Dsc(goodfile)
-        self.signed = Dsc(signed)
-        self.bad = Dsc(badfile)
-        self.badsigned = Dsc(badsigned)
-        self.badchecksums = Dsc(badchecksums)
+    @classmethod
+    def setUpClass(cls):
+        cls.dirn = os.path.dirname(__file__)
+        goodfile = os.path.join(cls.dirn, TEST_DSC_FILE)
+        signed = os.path.join(cls.dirn, TEST_SIGNED_DSC_FILE)
+        badfile = os.path.join(cls.dirn, TEST_BAD_DSC_FILE)
+        badsigned = os.path.join(cls.dirn, TEST_BAD_SIGNED_FILE)
+        badchecksums = os.path.join(cls.dirn, TEST_BAD_CHECKSUMS_FILE)
+        badsizes = os.path.join(cls.dirn, TEST_BAD_SIZES_FILE)
+        cls.good = Dsc(goodfile)
+        cls.signed = Dsc(signed)
+        cls.bad = Dsc(badfile)
+        cls.badsigned = Dsc(badsigned)
+        cls.badchecksums = Dsc(badchecksums)
+        cls.badsizes = Dsc(badsizes)
 
     def test_get_message_headers(self):
         self.assertEqual(self.good.source, 'testdeb')
@@ -103,6 +107,17 @@ class DscTest(unittest.TestCase):
         with pytest.raises(DscBadChecksumsError):
             self.badchecksums.validate()
 
+    def test_size_mismatch_reported_without_hashing(self):
+        # a file whose size differs from the dsc's assertion is never
+        # read; its corrected digest is reported as None
+        gz = os.path.join(self.dirn, 'testdeb_0.0.0.orig.tar.gz')
+        self.assertEqual(False, self.badsizes.all_checksums_correct)
+        self.assertEqual(
+            self.badsizes.corrected_checksums,
+            {'md5': {gz: None},
+             'sha1': {gz: None},
+             'sha256': {gz: None}})
+
     def test_message_internalization(self):
         self.maxDiff = None
         files = """142ca7334ed1f70302b4504566e0c233 280 testdeb_0.0.0.orig.tar.gz